@@ -0,0 +1,19 @@
+import os
+
+# --- 🚀 Production Server Profile ---
+# Usage: gunicorn -c gunicorn.conf.py main:app
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import main once in the master; forked workers share its memory copy-on-write.
+# An upload only swaps df in the worker that handled it; the others reload
+# when they see the CSV's mtime change (main.sync_dataset).
+preload_app = True
+timeout = 120
+
+def when_ready(server):
+    # Load the dataset and models before forking so every worker inherits them
+    import main
+    main.preload_state()
+    server.log.info(f"Preloaded {len(main.loaded_models)} models for {workers} workers")
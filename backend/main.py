@@ -1,58 +1,192 @@
-from fastapi import FastAPI, Body, UploadFile, File
+from fastapi import FastAPI, Body, UploadFile, File, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from importlib.metadata import version
+from pathlib import Path
+import aiofiles
+import asyncio
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as papq
 import joblib
 import os
-import random
+import tempfile
+import threading
 from google import genai
 from dotenv import load_dotenv
 
 load_dotenv()
-app = FastAPI(title="Aadhaar Drishti API")
-
-# --- 🛡️ FIXED: Explicit CORS Protocol ---
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], 
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 client = genai.Client(api_key=GEMINI_API_KEY)
 
 DATA_PATH = "data/uidai_district_summary.csv"
+REQUIRED_COLUMNS = {"date", "district", "total_updates", "total_enrolment"}
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+PUBLISHED_FILE_MODE = 0o644  # mkstemp files are 0600; published data stays world-readable
+AI_CHUNK_TIMEOUT = 15  # seconds to wait for each Gemini chunk
+AI_READ_THREADS = 8  # dedicated pool for blocking Gemini stream reads
+AI_FALLBACK = "Maintain current unit deployment."
 MODEL_FILES = {
     "XGBoost": "models/uidai_challenger_xgb.pkl",
     "RandomForest": "models/uidai_champion_rf.pkl"
 }
 
-# --- 🧠 FIXED: Robust Model Loading ---
-df = pd.read_csv(DATA_PATH) if os.path.exists(DATA_PATH) else None
-loaded_models = {}
+# Re-pickling is only needed when the installed model libraries change
+POLISH_TAG = f"sklearn{version('scikit-learn')}-xgb{version('xgboost')}"
+
+# float32 represents every integer below 2**24 exactly
+FLOAT32_EXACT_LIMIT = 2 ** 24
+
+# --- 📥 Dataset Ingestion (multi-threaded Arrow CSV reader) ---
+def read_dataset(path):
+    # Keep ISO dates as plain strings; Arrow would otherwise infer timestamps.
+    # Empty text cells stay null (as with pd.read_csv) so fillna(0) still applies
+    options = pacsv.ConvertOptions(column_types={"date": pa.string()}, strings_can_be_null=True)
+    frame = pacsv.read_csv(path, convert_options=options).to_pandas()
+    # UIDAI counts fit in 32 bits; narrower columns halve aggregation bandwidth
+    for col in frame.select_dtypes("integer").columns:
+        frame[col] = pd.to_numeric(frame[col], downcast="integer")
+    for col in frame.select_dtypes("float").columns:
+        # Counts arrive as floats (blank cells); only narrow when float32 is exact
+        values = frame[col].dropna()
+        if ((values % 1 == 0) & (values.abs() < FLOAT32_EXACT_LIMIT)).all():
+            frame[col] = frame[col].astype("float32")
+    return frame
 
-for name, path in MODEL_FILES.items():
-    if os.path.exists(path):
+# --- 🗄️ Parquet snapshot (typed, columnar; skips CSV parsing on restart) ---
+# Each snapshot records the mtime of the CSV it was parsed from and is trusted
+# only on an exact match, so a late-finishing write of an older upload can
+# never shadow the dataset actually on disk
+SNAPSHOT_SOURCE_KEY = b"aadhaar_drishti.source_mtime"
+
+def save_snapshot(frame, path, source_mtime):
+    # Write beside the target and swap in atomically: a killed process must
+    # never leave a truncated snapshot in place
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".parquet.tmp")
+    os.close(fd)
+    try:
+        table = pa.Table.from_pandas(frame)
+        metadata = {**(table.schema.metadata or {}), SNAPSHOT_SOURCE_KEY: repr(source_mtime).encode()}
+        papq.write_table(table.replace_schema_metadata(metadata), tmp_path, compression="zstd")
+        os.chmod(tmp_path, PUBLISHED_FILE_MODE)
+        os.replace(tmp_path, path + ".parquet")
+    except Exception as e:
+        os.remove(tmp_path)
+        print(f"⚠️ Parquet snapshot skipped: {e}")
+
+def load_dataset(path, source_mtime=None):
+    if source_mtime is None:
+        source_mtime = os.path.getmtime(path)
+    snapshot = path + ".parquet"
+    if os.path.exists(snapshot):
         try:
-            m = joblib.load(path)
-            joblib.dump(m, path) # Version polishing
-            loaded_models[name] = m
-            print(f"✅ {name} Loaded.")
+            table = papq.read_table(snapshot)
+            if (table.schema.metadata or {}).get(SNAPSHOT_SOURCE_KEY) == repr(source_mtime).encode():
+                return table.to_pandas()
         except Exception as e:
-            print(f"❌ Error loading {name}: {e}")
+            print(f"⚠️ Unreadable Parquet snapshot, re-parsing CSV: {e}")
+    frame = read_dataset(path)
+    save_snapshot(frame, path, source_mtime)
+    return frame
 
-@app.get("/")
-def health_check():
-    return {"status": "ONLINE", "records": len(df) if df is not None else 0}
+# --- 🧠 FIXED: Robust Model Loading ---
+def load_models():
+    models = {}
+    for name, path in MODEL_FILES.items():
+        if os.path.exists(path):
+            try:
+                m = joblib.load(path)
+                sentinel = Path(f"{path}.polished-{POLISH_TAG}")
+                if not sentinel.exists():
+                    joblib.dump(m, path) # Version polishing (once per library upgrade)
+                    sentinel.touch()
+                models[name] = m
+                print(f"✅ {name} Loaded.")
+            except Exception as e:
+                print(f"❌ Error loading {name}: {e}")
+    return models
 
-@app.get("/api/summary")
-def get_summary():
-    return df.fillna(0).to_dict(orient="records") if df is not None else []
+def load_all():
+    # mtime 0.0 marks "no dataset on disk yet" so a later upload is still picked up
+    mtime = os.path.getmtime(DATA_PATH) if os.path.exists(DATA_PATH) else 0.0
+    frame = load_dataset(DATA_PATH, mtime) if mtime else None
+    return frame, mtime, load_models()
 
-@app.get("/api/governance-indices")
-def get_indices():
-    if df is None or df.empty: return []
+df = None
+df_mtime = None  # mtime of the CSV df was loaded from; None = not loaded from disk
+loaded_models = {}
+_dataset_lock = threading.Lock()
+
+def preload_state():
+    # Called in the Gunicorn master (see gunicorn.conf.py) so forked workers share it
+    global df, df_mtime, loaded_models
+    df, df_mtime, loaded_models = load_all()
+
+def sync_dataset():
+    # Uploads land in one worker only; the others reload when the CSV on disk changes
+    global df, df_mtime
+    if df_mtime is None: return
+    try:
+        mtime = os.path.getmtime(DATA_PATH)
+    except OSError:
+        return
+    if mtime == df_mtime: return
+    with _dataset_lock:
+        if mtime != df_mtime:
+            df = load_dataset(DATA_PATH, mtime)
+            df_mtime = mtime
+
+@asynccontextmanager
+async def lifespan(app):
+    # Heavy I/O runs on a worker thread so the event loop stays free
+    global df, df_mtime, loaded_models
+    if df_mtime is None:
+        df, df_mtime, loaded_models = await asyncio.to_thread(load_all)
+    yield
+
+app = FastAPI(title="Aadhaar Drishti API", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# --- 🛡️ FIXED: Explicit CORS Protocol ---
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"], 
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# --- ⚡ Derived-data cache (rebuilt only when df is replaced) ---
+_derived_source = None
+_derived_cache = {}
+_derived_lock = threading.Lock()
+
+def cached_for_df(key, build):
+    # Build from one snapshot of df and only store the result if that frame is
+    # still current, so a slow build can never file a stale payload
+    global _derived_source
+    sync_dataset()
+    frame = df
+    with _derived_lock:
+        if _derived_source is not frame:
+            _derived_cache.clear()
+            _derived_source = frame
+        if key in _derived_cache:
+            return _derived_cache[key]
+    value = build(frame)
+    with _derived_lock:
+        if _derived_source is frame:
+            _derived_cache[key] = value
+    return value
+
+def build_summary(frame):
+    return frame.fillna(0).to_json(orient="records").encode() if frame is not None else b"[]"
+
+def build_indices(frame):
+    if frame is None or frame.empty: return []
     # Simplified logic for compliance, growth, stability, freshness, equity
     return [
         {"subject": 'Compliance', "A": 85.2},
@@ -62,6 +196,57 @@ def get_indices():
         {"subject": 'Equity', "A": 88.5},
     ]
 
+@app.get("/")
+def health_check():
+    sync_dataset()
+    return {"status": "ONLINE", "records": len(df) if df is not None else 0}
+
+@app.get("/api/summary")
+def get_summary():
+    return Response(content=cached_for_df("summary", build_summary), media_type="application/json")
+
+@app.get("/api/governance-indices")
+def get_indices():
+    return cached_for_df("indices", build_indices)
+
+def parse_staged_upload(staging_path):
+    missing = REQUIRED_COLUMNS - set(pd.read_csv(staging_path, nrows=0).columns)
+    if missing:
+        raise ValueError(f"missing columns {sorted(missing)}")
+    return read_dataset(staging_path)
+
+def publish_upload(staging_path, new_df):
+    # Same lock as sync_dataset, so this worker never reloads its own upload
+    global df, df_mtime
+    os.chmod(staging_path, PUBLISHED_FILE_MODE)
+    with _dataset_lock:
+        os.replace(staging_path, DATA_PATH)
+        df, df_mtime = new_df, os.path.getmtime(DATA_PATH)
+        return df_mtime
+
+@app.post("/api/upload-data")
+async def upload_csv(file: UploadFile = File(...)):
+    # Stream to a per-request staging file so a bad or concurrent upload
+    # never clobbers the live dataset
+    os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
+    fd, staging_path = tempfile.mkstemp(dir=os.path.dirname(DATA_PATH), suffix=".upload")
+    os.close(fd)
+    try:
+        async with aiofiles.open(staging_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await out.write(chunk)
+        try:
+            new_df = await asyncio.to_thread(parse_staged_upload, staging_path)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid dataset: {e}")
+        published_mtime = await asyncio.to_thread(publish_upload, staging_path, new_df)
+    except BaseException:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+        raise
+    await asyncio.to_thread(save_snapshot, new_df, DATA_PATH, published_mtime)
+    return {"status": "INGESTED", "records": len(new_df)}
+
 @app.get("/api/model-comparison")
 def compare_models():
     if not loaded_models: return {"error": "Models offline"}
@@ -71,14 +256,39 @@ def compare_models():
         "random_forest": {"val": "0.25M", "confidence": 0.82, "sensitivity": "Stable"}
     }
 
+def sse_event(text):
+    return "".join(f"data: {line}\n" for line in text.split("\n")) + "\n"
+
+# Pre-encoded once: during a Gemini outage every briefing takes this path
+AI_FALLBACK_EVENT = sse_event(AI_FALLBACK)
+
+# The pinned SDK reads stream chunks with blocking requests I/O (even via
+# client.aio) and no socket timeout. A read abandoned by wait_for can stay
+# blocked indefinitely on a half-open connection, so Gemini reads get their own
+# bounded pool and can never starve the default executor used by ingestion.
+ai_executor = ThreadPoolExecutor(max_workers=AI_READ_THREADS, thread_name_prefix="gemini-read")
+
+async def stream_interpretation(prompt):
+    streamed = False
+    loop = asyncio.get_running_loop()
+    try:
+        stream = iter(client.models.generate_content_stream(model="gemini-1.5-flash", contents=prompt))
+        while True:
+            chunk = await asyncio.wait_for(loop.run_in_executor(ai_executor, next, stream, None), AI_CHUNK_TIMEOUT)
+            if chunk is None:
+                break
+            if chunk.text:
+                streamed = True
+                yield sse_event(chunk.text)
+    except Exception:
+        # Circuit breaker: only fall back if the briefing never started
+        if not streamed:
+            yield AI_FALLBACK_EVENT
+
 @app.post("/api/ai-interpret")
 async def interpret(payload: dict = Body(...)):
     prompt = f"Advisor: {payload.get('model')} predicts {payload.get('volume')}. Action? Max 40 words."
-    try:
-        res = client.models.generate_content(model="gemini-1.5-flash", contents=prompt)
-        return {"interpretation": res.text}
-    except:
-        return {"interpretation": "Maintain current unit deployment."}
+    return StreamingResponse(stream_interpretation(prompt), media_type="text/event-stream")
 
 if __name__ == "__main__":
     import uvicorn
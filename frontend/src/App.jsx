@@ -135,13 +135,35 @@ function App() {
     const currentPred = predictionDetails?.[modelKey];
 
     try {
-      const res = await axios.post('https://aadhaar-drishti.onrender.com/api/ai-interpret', {
-        model: activeModel,
-        volume: currentPred?.val || "N/A",
-        confidence: `${(currentPred?.confidence * 100).toFixed(1)}%`,
-        district: "National Strategic Grid"
+      // Briefing arrives as server-sent events; render it as tokens stream in
+      const res = await fetch('https://aadhaar-drishti.onrender.com/api/ai-interpret', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          model: activeModel,
+          volume: currentPred?.val || "N/A",
+          confidence: `${(currentPred?.confidence * 100).toFixed(1)}%`,
+          district: "National Strategic Grid"
+        })
       });
-      setAiBriefing(res.data.interpretation);
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let briefing = "";
+      setAiBriefing("");
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const event of events) {
+          briefing += event.split("\n").map(line => line.replace(/^data: /, "")).join("\n");
+        }
+        setAiBriefing(briefing);
+      }
     } catch (err) {
       setAiBriefing("Strategic Briefing failed. Verify backend AI configuration.");
     } finally {